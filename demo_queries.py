@@ -9,13 +9,17 @@ query English Wikipedia's MediaWiki API.  Here's the basic flow:
 1. Log in
 2. Confirm logged-in status
 3. Query for the last 5 revisions of User_talk:EpochFail
-4. Query for these revisions by their revision ID
+4. Query for these revisions by their revision ID (concurrently, with an
+   `AsyncSession`)
 5. Cause the API to throw an error and catch it.
 
 """
+import asyncio
 import sys
 from itertools import islice
 
+import aiohttp
+
 import mwapi
 import mwapi.cli
 import mwapi.errors
@@ -31,69 +35,99 @@ print("whoami?")
 print("\t", session.get(action='query', meta='userinfo'), "\n")
 
 
-def query_revisions_by_revids(revids, batch=50, **params):
+async def query_revisions_by_revids(async_session, revids, batch=50,
+                                    concurrency=8, **params):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(batch_ids):
+        async with sem:
+            return await async_session.post(action='query', prop='revisions',
+                                            revids=batch_ids, **params)
 
     revids_iter = iter(revids)
+    tasks = []
     while True:
         batch_ids = list(islice(revids_iter, 0, batch))
         if len(batch_ids) == 0:
             break
         else:
-            doc = session.post(action='query', prop='revisions',
-                               revids=batch_ids, **params)
+            tasks.append(_one(batch_ids))
 
-            for page_doc in doc['query']['pages']:
-                page_meta = {k: v for k, v in page_doc.items()
-                             if k != 'revisions'}
-                if 'revisions' in page_doc:
-                    for revision_doc in page_doc['revisions']:
-                        revision_doc['page'] = page_meta
-                        yield revision_doc
+    for fut in asyncio.as_completed(tasks):
+        doc = await fut
+        for page_doc in doc['query']['pages']:
+            revisions = page_doc.pop('revisions', None)
+            if revisions is not None:
+                for revision_doc in revisions:
+                    revision_doc['page'] = page_doc
+                    yield revision_doc
 
 
-def query_revisions(title=None, pageid=None, batch=50, limit=50,
-                    **params):
-    if title is None and pageid is None:
-        raise TypeError("query_revisions requires 'title' or 'pageid'")
+def query_revisions(titles=None, pageids=None, batch=50, limit=50,
+                    titles_per_request=50, **params):
+    if titles is None and pageids is None:
+        raise TypeError("query_revisions requires 'titles' or 'pageids'")
 
-    params.update({
-        'titles': title,
-        'pageids': pageid
-    })
+    if titles is not None:
+        param_name, all_values = 'titles', titles
+    else:
+        param_name, all_values = 'pageids', pageids
+    if isinstance(all_values, (str, int)):
+        all_values = [all_values]  # A single title or pageid
+    values_iter = iter(all_values)
 
     yielded = 0
-    response_docs = session.post(action='query', prop='revisions',
-                                 rvlimit=min(batch, limit),
-                                 continuation=True,
-                                 **params)
-    for doc in response_docs:
-        for page_doc in doc['query']['pages']:
-            page_meta = {k: v for k, v in page_doc.items() if k != 'revisions'}
-            if 'revisions' in page_doc:
-                for revision_doc in page_doc['revisions']:
-                    revision_doc['page'] = page_meta
-                    yield revision_doc
-                    yielded += 1
-                    if yielded >= limit:
-                        break
+    while yielded < limit:
+        values = list(islice(values_iter, 0, titles_per_request))
+        if len(values) == 0:
+            break
+
+        chunk_params = dict(params)
+        chunk_params[param_name] = values
+        if len(values) == 1:
+            # rvlimit is only allowed when querying a single page
+            chunk_params['rvlimit'] = min(batch, limit)
+
+        response_docs = session.post(action='query', prop='revisions',
+                                     continuation=True,
+                                     **chunk_params)
+        for doc in response_docs:
+            for page_doc in doc['query']['pages']:
+                revisions = page_doc.pop('revisions', None)
+                if revisions is not None:
+                    revisions = revisions[:limit - yielded]
+                    yield page_doc, revisions
+                    yielded += len(revisions)
+                if yielded >= limit:
+                    break
             if yielded >= limit:
                 break
-        if yielded >= limit:
-            break
 
 
 print("Querying by title")
 rev_ids = []
 sys.stdout.write("\t ")
-for doc in query_revisions(title="User_talk:EpochFail", rvprop="ids", limit=70):
-    sys.stdout.write(".")
-    sys.stdout.flush()
-    rev_ids.append(doc['revid'])
+for page_doc, revisions in query_revisions(titles=["User_talk:EpochFail"],
+                                           rvprop="ids", limit=70):
+    for revision_doc in revisions:
+        sys.stdout.write(".")
+        sys.stdout.flush()
+        rev_ids.append(revision_doc['revid'])
 sys.stdout.write("\n\n")
 
+
+async def print_revisions_by_revids(revids):
+    async with aiohttp.ClientSession() as s:
+        async_session = mwapi.AsyncSession('https://en.wikipedia.org',
+                                           formatversion=2,
+                                           user_agent=my_agent,
+                                           session=s)
+        async for doc in query_revisions_by_revids(async_session, revids):
+            print("\t", doc['page'], doc['revid'], doc['comment'])
+
+
 print("Querying by rev_id")
-for doc in query_revisions_by_revids(rev_ids):
-    print("\t", doc['page'], doc['revid'], doc['comment'])
+asyncio.run(print_revisions_by_revids(rev_ids))
 print("")
 
 print("Query with an error")
@@ -13,13 +13,29 @@ convenience functions for calling the MediaWiki API -- for example,
 :License: MIT
 """
 from .session import Session
-from .async_session import AsyncSession
+
+try:
+    from .async_session import AsyncSession
+except ImportError as e:  # aiohttp is not installed
+    _async_session_error = e
+else:
+    _async_session_error = None
 from .about import (__name__, __version__, __author__, __author_email__,
                     __description__, __license__, __url__)
 
 
 MWApi = Session
 
-__all__ = [MWApi, Session, AsyncSession,
+__all__ = [MWApi, Session,
            __name__, __version__, __author__, __author_email__,
            __description__, __license__, __url__]
+if _async_session_error is None:
+    __all__.insert(2, AsyncSession)
+
+
+def __getattr__(name):
+    if name == "AsyncSession":
+        raise ImportError("mwapi.AsyncSession requires aiohttp to be "
+                          "installed") from _async_session_error
+    raise AttributeError("module 'mwapi' has no attribute {0!r}"
+                         .format(name))
@@ -1,3 +1,17 @@
+"""
+Asynchronous Session
+====================
+
+:class:`mwapi.AsyncSession` mirrors :class:`mwapi.Session` for use with
+:mod:`asyncio`.  Its :func:`~mwapi.AsyncSession.get`,
+:func:`~mwapi.AsyncSession.post` and :func:`~mwapi.AsyncSession.request`
+methods are coroutines, continued queries are returned as asynchronous
+generators, and :func:`~mwapi.AsyncSession.gather` sends many requests
+concurrently over a pool of keep-alive connections.
+
+.. autoclass:: mwapi.AsyncSession
+    :members:
+"""
 import logging
 
 import asyncio
@@ -5,7 +19,8 @@ import aiohttp
 
 from .errors import (APIError, ConnectionError, RequestError, TimeoutError,
                      TooManyRedirectsError)
-from .util import _normalize_params
+from .util import (MAX_RETRIES, _loads, _normalize_params, _retry_delay,
+                   _retry_statuses, _split_params)
 
 DEFAULT_USERAGENT = "mwapi (python) -- default user-agent"
 
@@ -14,7 +29,11 @@ logger = logging.getLogger(__name__)
 
 class AsyncSession:
     """
-    Constructs a new API asynchronous session.
+    Constructs a new API asynchronous session.  GET requests that receive a
+    429 or 5xx response are retried (up to 5 times) with exponential backoff,
+    honoring the server's Retry-After header.  POST requests, which may edit,
+    are only retried after a 429 or 503 response so that an action is never
+    applied twice.
 
     :Parameters:
         host : `str`
@@ -28,93 +47,132 @@ class AsyncSession:
             The formatversion to supply to the API for all requests.
         api_path : `str`
             The path to "api.php" on the server -- must begin with "/".
-        timeout : `float`
-            How long to wait for the server to send data before giving up
+        timeout : `float` | `aiohttp.ClientTimeout`
+            How long to wait for a whole request to complete before giving up
             and raising an error (
             :class:`aiohttp.client_exceptions.ServerTimeoutError` or
-            :class:`asyncio.TimeoutError`).
-            By default aiohttp uses a total 300 seconds (5min) timeout.
+            :class:`asyncio.TimeoutError`).  Defaults to a total 300 seconds
+            (5min) timeout.  If a :class:`aiohttp.ClientTimeout` is provided,
+            it is used as-is and `connect_timeout` and `sock_read_timeout` are
+            ignored.
+        connect_timeout : `float`
+            How long to wait for a connection to the server to be established.
+            Fails fast on unreachable hosts.  `None` disables this timeout.
+        sock_read_timeout : `float`
+            How long to wait between chunks of data sent by the server.
+            `None` disables this timeout.
         session : `aiohttp.ClientSession`
             (optional) an `aiohttp` session object to use
+        connector_limit : `int`
+            The total number of simultaneous connections to keep open when
+            constructing a new `aiohttp` session (ignored if `session` is
+            provided).
+        connector_limit_per_host : `int`
+            The number of simultaneous connections to the same host when
+            constructing a new `aiohttp` session (ignored if `session` is
+            provided).
+        keepalive_timeout : `float`
+            How long (in seconds) to keep an idle connection open for reuse
+            when constructing a new `aiohttp` session (ignored if `session` is
+            provided).
     """
 
     def __init__(self, host, user_agent=None, formatversion=None,
                  api_path=None,
-                 timeout=None, session=None, **session_params):
+                 timeout=None, connect_timeout=10, sock_read_timeout=60,
+                 session=None, connector_limit=64,
+                 connector_limit_per_host=64, keepalive_timeout=85,
+                 **session_params):
         self.host = str(host)
         self.formatversion = int(formatversion) \
             if formatversion is not None else None
         self.api_path = str(api_path or "/w/api.php")
         self.api_url = self.host + self.api_path
-        self.timeout = float(timeout) \
-            if timeout is not None else aiohttp.ClientTimeout(total=300)
-        self.session = session or aiohttp.ClientSession()
-        for key, value in session_params.items():
-            setattr(self.session, key, value)
-
-        self.headers = {}
+        if isinstance(timeout, aiohttp.ClientTimeout):
+            self.timeout = timeout
+        else:
+            total = float(timeout) if timeout is not None else 300
+            self.timeout = aiohttp.ClientTimeout(
+                total=total,
+                connect=_cap_timeout(connect_timeout, total),
+                sock_read=_cap_timeout(sock_read_timeout, total))
+        self._base_params = {'format': "json"}
+        if self.formatversion is not None:
+            self._base_params['formatversion'] = self.formatversion
 
         if user_agent is None:
             logger.warning("Sending requests with default User-Agent.  " +
                            "Set 'user_agent' on mwapi.Session to quiet this " +
                            "message.")
-            self.headers['User-Agent'] = DEFAULT_USERAGENT
+            self.user_agent = DEFAULT_USERAGENT
         else:
-            self.headers['User-Agent'] = user_agent
+            self.user_agent = user_agent
+        self.headers = {'User-Agent': self.user_agent}
+
+        # Our own aiohttp session sends self.headers by default.  A session
+        # provided by the caller needs them passed along with each request.
+        self._request_headers = self.headers if session is not None else None
+        if session is None:
+            connector = aiohttp.TCPConnector(
+                limit=connector_limit,
+                limit_per_host=connector_limit_per_host,
+                keepalive_timeout=keepalive_timeout,
+                ttl_dns_cache=300,
+                enable_cleanup_closed=True)
+            session = aiohttp.ClientSession(connector=connector,
+                                            headers=self.headers)
+        self.session = session
+        for key, value in session_params.items():
+            setattr(self.session, key, value)
 
     async def _request(self, method, params=None, auth=None):
-        params = params or {}
-        if self.formatversion is not None:
-            params['formatversion'] = self.formatversion
-
-        if method.lower() == "post":
-            data = params
-            data['format'] = "json"
-            params = None
-
-        else:
-            data = None
-            params = params or {}
-            params['format'] = "json"
+        params, data = _split_params(
+            method, {**(params or {}), **self._base_params})
+        retry_statuses = _retry_statuses(method)
+
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                async with self.session.request(
+                        method=method, url=self.api_url, params=params,
+                        data=data, timeout=self.timeout,
+                        headers=self._request_headers, verify_ssl=True,
+                        auth=auth) as resp:
+                    if resp.status in retry_statuses and \
+                       attempt < MAX_RETRIES:
+                        delay = _retry_delay(
+                            attempt, resp.headers.get('Retry-After'))
+                    else:
+                        body = await resp.read()
+                        break
+            except (aiohttp.ServerTimeoutError,
+                    asyncio.TimeoutError) as e:
+                raise TimeoutError(str(e)) from e
+            except aiohttp.ClientConnectionError as e:
+                raise ConnectionError(str(e)) from e
+            except aiohttp.TooManyRedirects as e:
+                raise TooManyRedirectsError(str(e)) from e
+            except Exception as e:
+                raise RequestError(str(e)) from e
+
+            logger.debug("Retrying request after a {0} response in {1:.2f}s"
+                         .format(resp.status, delay))
+            await asyncio.sleep(delay)
 
         try:
-            async with self.session.request(method=method, url=self.api_url,
-                                            params=params, data=data,
-                                            timeout=self.timeout,
-                                            headers=self.headers,
-                                            verify_ssl=True,
-                                            auth=auth) as resp:
-
-                doc = await resp.json()
-
-                if 'error' in doc:
-                    raise APIError.from_doc(doc['error'])
-
-                if 'warnings' in doc:
-                    logger.warning("The following query raised warnings: {0}"
-                                   .format(params or data))
-                    for module, warning in doc['warnings'].items():
-                        logger.warning("\t- {0} -- {1}"
-                                       .format(module, warning))
-                return doc
-
-        except (ValueError, aiohttp.ContentTypeError):
-            if resp is None:
-                prefix = "No response data"
-            else:
-                prefix = (await resp.text())[:350]
+            doc = _loads(body)
+        except ValueError:
             raise ValueError("Could not decode as JSON:\n{0}"
-                             .format(prefix))
-        except (aiohttp.ServerTimeoutError,
-                asyncio.TimeoutError) as e:
-            raise TimeoutError(str(e)) from e
-        except aiohttp.ClientConnectionError as e:
-            raise ConnectionError(str(e)) from e
-        except aiohttp.TooManyRedirects as e:
-            raise TooManyRedirectsError(str(e)) from e
-        except Exception as e:
-            raise RequestError(str(e)) from e
+                             .format(body[:350].decode('utf-8', 'replace')))
+
+        if 'error' in doc:
+            raise APIError.from_doc(doc['error'])
 
+        if 'warnings' in doc and logger.isEnabledFor(logging.WARNING):
+            logger.warning("The following query raised warnings: %s",
+                           params or data)
+            for module, warning in doc['warnings'].items():
+                logger.warning("\t- %s -- %s", module, warning)
+        return doc
 
     async def request(self, method, params=None, query_continue=None,
                       auth=None, continuation=False):
@@ -148,17 +206,54 @@ class AsyncSession:
         else:
             return await self._request(method, params=normal_params, auth=auth)
 
+    def continuation(self, method, params=None, query_continue=None,
+                     auth=None):
+        """
+        Makes a request and, if the response calls for a continuation,
+        performs that continuation.
+
+        :Parameters:
+            method : `str`
+                Which HTTP method to use for the request?
+                (Usually "POST" or "GET")
+            params : `dict`
+                A set of parameters to send with the request.  These parameters
+                will be included in the POST body for post requests or a query
+                string otherwise.
+            query_continue : `dict`
+                A 'continue' field from a past request.  This field represents
+                the point from which a query should be continued.
+            auth : mixed
+                Auth tuple or callable to enable Basic/Digest/Custom HTTP Auth.
+
+        :Returns:
+            An asynchronous generator of response JSON documents.
+        """
+        normal_params = _normalize_params(params or {}, query_continue)
+        return self._continuation(method, params=normal_params, auth=auth)
+
     async def _continuation(self, method, params=None, auth=None):
         if "continue" not in params:
             params["continue"] = ""
 
-        while True:
-            doc = await self._request(method, params=params, auth=auth)
-            yield doc
-            if "continue" not in doc:
-                break
-            # re-send all continue values in the next call
-            params.update(doc["continue"])
+        # The request for the next page is started before the current one is
+        # yielded so that it is in flight while the caller processes the doc.
+        task = asyncio.create_task(
+            self._request(method, params=dict(params), auth=auth))
+        try:
+            while task is not None:
+                doc = await task
+                if "continue" in doc:
+                    # re-send all continue values in the next call
+                    params.update(doc["continue"])
+                    task = asyncio.create_task(
+                        self._request(method, params=dict(params), auth=auth))
+                else:
+                    task = None
+                yield doc
+        finally:
+            if task is not None:
+                task.cancel()
 
     async def get(self, query_continue=None, auth=None, continuation=False,
                   **params):
@@ -211,3 +306,47 @@ class AsyncSession:
         return await self.request("POST", params=params, auth=auth,
                                   query_continue=query_continue,
                                   continuation=continuation)
+
+    async def gather(self, method, param_dicts, *, concurrency=16, auth=None):
+        """
+        Sends many API requests concurrently and returns their responses in
+        the order that `param_dicts` was given.  This is useful for fanning
+        out a query over many batches of titles or revision IDs::
+
+            >>> batches = [revids[i:i + 50]
+            ...            for i in range(0, len(revids), 50)]
+            >>> docs = await session.gather(
+            ...     "POST", [{'action': 'query', 'prop': 'revisions',
+            ...               'revids': batch} for batch in batches])
+
+        :Parameters:
+            method : `str`
+                Which HTTP method to use for the requests?
+                (Usually "POST" or "GET")
+            param_dicts : `iterable` ( `dict` )
+                A set of parameters for each request to send.
+            concurrency : `int`
+                The maximum number of requests to have in flight at once.
+            auth : mixed
+                Auth tuple or callable to enable Basic/Digest/Custom HTTP Auth.
+
+        :Returns:
+            A `list` of response JSON documents
+
+        :Raises:
+            :class:`mwapi.errors.APIError` : if the API responds with an error
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def _call(params):
+            async with sem:
+                return await self._request(
+                    method, params=_normalize_params(params, None), auth=auth)
+
+        return await asyncio.gather(*[_call(params)
+                                      for params in param_dicts])
+
+
+def _cap_timeout(timeout, total):
+    # None disables a timeout in aiohttp
+    return min(timeout, total) if timeout is not None else None
@@ -7,11 +7,14 @@ command-line.
 
 .. autofunction:: mwapi.cli.do_login
 """
+import atexit
 import getpass
 import sys
 
 from .errors import ClientInteractionRequest
 
+_tty = None
+
 
 def do_login(session, for_what):
     """
@@ -55,7 +58,7 @@ def request_interaction(cir):
             else:
                 sys.stderr.write(prefix)
                 sys.stderr.flush()
-                value = open('/dev/tty').readline().strip()
+                value = _get_tty().readline().strip()
 
             params[name] = value
 
@@ -66,4 +69,12 @@ def request_username_password(for_what):
     sys.stderr.write("Log into " + for_what + "\n")
     sys.stderr.write("Username: ")
     sys.stderr.flush()
-    return open('/dev/tty').readline().strip(), getpass.getpass("Password: ")
+    return _get_tty().readline().strip(), getpass.getpass("Password: ")
+
+
+def _get_tty():
+    global _tty
+    if _tty is None:
+        _tty = open('/dev/tty', 'r')
+        atexit.register(_tty.close)
+    return _tty
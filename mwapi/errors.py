@@ -17,8 +17,23 @@ Errors
 .. autoclass:: TimeoutError
 """
 import requests.exceptions
-import aiohttp
-import asyncio
+
+try:
+    import asyncio
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+if aiohttp is not None:
+    _aio_client_error = (aiohttp.ClientError,)
+    _aio_connection_error = (aiohttp.ClientConnectionError,)
+    _aio_too_many_redirects = (aiohttp.TooManyRedirects,)
+    _aio_timeout_error = (aiohttp.ServerTimeoutError, asyncio.TimeoutError)
+else:
+    _aio_client_error = ()
+    _aio_connection_error = ()
+    _aio_too_many_redirects = ()
+    _aio_timeout_error = ()
 
 
 class APIError(RuntimeError):
@@ -26,11 +41,9 @@ class APIError(RuntimeError):
     Thrown when the MediaWiki API returns an error.
     """
     def __init__(self, code, info, content):
-        super().__init__((code, info, content))
         self.code = code
         self.info = info
         self.content = content
-
         super().__init__("{0}: {1} -- {2}".format(code, info, content))
 
     @classmethod
@@ -69,7 +82,7 @@ class ClientInteractionRequest(RuntimeError):
 
 
 class RequestError(requests.exceptions.RequestException,
-                   aiohttp.ClientError):
+                   *_aio_client_error):
     """
     A generic error thrown by :mod:`requests` or `aiohttp`.
     """
@@ -77,7 +90,7 @@ class RequestError(requests.exceptions.RequestException,
 
 
 class ConnectionError(requests.exceptions.ConnectionError,
-                      aiohttp.ClientConnectionError):
+                      *_aio_connection_error):
     """
     Handles a :class:`requests.exceptions.ConnectionError` or
               :class:`aiohttp.ClientConnectionError`.
@@ -93,7 +106,7 @@ class HTTPError(requests.exceptions.HTTPError):
 
 
 class TooManyRedirectsError(requests.exceptions.TooManyRedirects,
-                            aiohttp.TooManyRedirects):
+                            *_aio_too_many_redirects):
     """
     Handles a :class:`requests.exceptions.TooManyRedirects` or
               :class:`aiohttp.TooManyRedirects`.
@@ -102,8 +115,7 @@ class TooManyRedirectsError(requests.exceptions.TooManyRedirects,
 
 
 class TimeoutError(requests.exceptions.Timeout,
-                   aiohttp.ServerTimeoutError,
-                   asyncio.TimeoutError):
+                   *_aio_timeout_error):
     """
     Handles a :class:`requests.exceptions.TimeoutError` or
               :class:`aiohttp.ServerTimeoutError` or
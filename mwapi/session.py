@@ -14,24 +14,67 @@ afterwards.
 .. autoclass:: mwapi.Session
     :members:
 """
+import inspect
+import json
 import logging
+import os
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 
 import requests
+import requests.adapters
 import requests.exceptions
+import requests.utils
+import urllib3.exceptions
+from urllib3.util.retry import Retry
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    from requests_toolbelt.multipart.encoder import MultipartEncoder
+except ImportError:
+    MultipartEncoder = None
 
 from .errors import (APIError, ClientInteractionRequest, ConnectionError,
                      HTTPError, LoginError, RequestError, TimeoutError,
                      TooManyRedirectsError)
-from .util import _normalize_params
+from .util import (BACKOFF_FACTOR, BACKOFF_JITTER, BACKOFF_MAX, MAX_RETRIES,
+                   _loads, _normalize_params, _retry_delay, _retry_statuses,
+                   _split_params)
 
 DEFAULT_USERAGENT = "mwapi (python) -- default user-agent"
+# Compressed responses are asked for explicitly, in every encoding urllib3
+# can decompress as they are read.
+DEFAULT_HEADERS = MappingProxyType({
+    'User-Agent': DEFAULT_USERAGENT,
+    'Accept-Encoding': requests.utils.DEFAULT_ACCEPT_ENCODING})
+POOL_CONNECTIONS = 1  # A Session only talks to a single host
+POOL_MAXSIZE = 32
+CACHE_NAME = "mwapi_cache"
+CACHE_EXPIRE_AFTER = 300
+# meta= modules whose responses depend on who is logged in
+PRIVATE_META = frozenset(['tokens', 'userinfo'])
 
 logger = logging.getLogger(__name__)
 
+_formatversion_suggested = False
+
 
 class Session:
     """
-    Constructs a new API session.
+    Constructs a new API session.  Unless a `session` is provided, requests
+    that fail to connect are retried (up to 5 times) over the same pooled
+    connections with exponential backoff, honoring the server's Retry-After
+    header, so callers don't need to wrap calls in their own retry loops.  GET
+    requests are also retried after a 429 or 5xx response.  POST requests,
+    which may edit, are only retried after a 429 or 503 response so that an
+    action is never applied twice.  Read timeouts are never retried.
 
     :Parameters:
         host : `str`
@@ -50,88 +93,161 @@ class Session:
             and raising an error (:class:`requests.exceptions.Timeout`,
             :class:`requests.exceptions.ReadTimeout` or
             :class:`requests.exceptions.ConnectTimeout`).  The default behavior
-            is to hang indefinitely.
+            is to hang indefinitely.  A read timeout is raised as soon as it
+            happens, but failed connections are retried with backoff first, so
+            an unreachable or refusing server takes about 15 seconds (plus
+            any connect timeouts) to fail.
         session : `requests.Session`
-            (optional) a `requests` session object to use
+            (optional) a `requests` session object to use.  If not provided,
+            a session is constructed with a pooled
+            :class:`requests.adapters.HTTPAdapter` that keeps connections
+            alive between requests and retries transient failures.
+        cache_backend : `str` | `requests_cache.BaseCache`
+            (optional) if set, GET responses are cached for 5 minutes with
+            :mod:`requests_cache` using this backend (e.g. "sqlite" or
+            "memory") and revalidated with the server's ETag.  Responses are
+            cached per set of cookies, so a login never sees responses cached
+            for the anonymous user.  Responses carrying an API error and
+            token or user info queries are never cached.  Requires
+            `requests-cache` to be installed.  Ignored if `session` is
+            provided.
+        cookie_path : `str`
+            (optional) a file in which to persist the session's cookies after
+            a successful login.  If the file exists, its cookies are loaded
+            into the session and :func:`~mwapi.Session.login` will skip the
+            login handshake while they remain valid.
     """
 
+    __slots__ = ('host', 'formatversion', 'api_path', 'api_url', 'timeout',
+                 '_base_params', 'session', 'cookie_path', 'headers',
+                 '_token_cache', '_retry_posts')
+
     def __init__(self, host, user_agent=None, formatversion=None,
                  api_path=None,
-                 timeout=None, session=None, **session_params):
-        self.host = str(host)
+                 timeout=None, session=None, cache_backend=None,
+                 cookie_path=None, **session_params):
+        self.host = host if type(host) is str else str(host)
         self.formatversion = int(formatversion) \
             if formatversion is not None else None
-        self.api_path = str(api_path or "/w/api.php")
+        api_path = api_path or "/w/api.php"
+        self.api_path = api_path if type(api_path) is str else str(api_path)
         self.api_url = self.host + self.api_path
         self.timeout = float(timeout) if timeout is not None else None
-        self.session = session or requests.Session()
+        self._base_params = {'format': "json"}
+        if self.formatversion is not None:
+            self._base_params['formatversion'] = self.formatversion
+        self.session = session or _pooled_session(cache_backend)
+        self._retry_posts = session is None
         for key, value in session_params.items():
             setattr(self.session, key, value)
 
-        self.headers = {}
+        self._token_cache = {}
+
+        self.cookie_path = cookie_path
+        if cookie_path is not None and os.path.exists(cookie_path):
+            _load_cookies(self.session.cookies, cookie_path)
+
+        self.headers = dict(DEFAULT_HEADERS)
 
         if user_agent is None:
             logger.warning("Sending requests with default User-Agent.  " +
                            "Set 'user_agent' on mwapi.Session to quiet this " +
                            "message.")
-            self.headers['User-Agent'] = DEFAULT_USERAGENT
         else:
             self.headers['User-Agent'] = user_agent
 
+        global _formatversion_suggested
+        if self.formatversion is None and not _formatversion_suggested:
+            logger.info("Consider setting formatversion=2 on mwapi.Session " +
+                        "for smaller responses that are faster to decode.")
+            _formatversion_suggested = True
+
     def _request(self, method, params=None, files=None, auth=None):
-        params = params or {}
-        if self.formatversion is not None:
-            params['formatversion'] = self.formatversion
+        params, data = _split_params(
+            method, {**(params or {}), **self._base_params})
+
+        # urllib3 retries GETs, but it can't rewind a streamed request body,
+        # so requests that send a body are retried here instead.
+        retries = MAX_RETRIES if self._retry_posts and data is not None and \
+            _can_resend(files) else 0
+        for attempt in range(retries + 1):
+            resp, body = self._send(method, params, data, files, auth)
+            if attempt < retries and \
+               resp.status_code in _retry_statuses(method):
+                delay = _retry_delay(attempt, resp.headers.get('Retry-After'))
+                logger.debug("Retrying request after a {0} response in "
+                             "{1:.2f}s".format(resp.status_code, delay))
+                time.sleep(delay)
+            else:
+                break
 
-        if method.lower() == "post":
-            data = params
-            data['format'] = "json"
-            params = None
-        else:
-            data = None
-            params = params or {}
-            params['format'] = "json"
+        return self._read_doc(body, params or data)
 
+    def _send(self, method, params, data, files, auth):
+        headers = self.headers
         try:
+            if files is not None and data is not None and \
+               self._streams_uploads(auth):
+                # Stream the multipart body instead of having requests build
+                # a complete copy of it in memory.
+                fields = {key: value if isinstance(value, (str, bytes))
+                          else str(value)
+                          for key, value in data.items()}
+                for name, content in files.items():
+                    # (filename, data[, content type[, headers]]) tuples are
+                    # understood by both requests and MultipartEncoder.
+                    fields[name] = content if isinstance(content, tuple) \
+                        else (name, content, "application/octet-stream")
+                data, files = MultipartEncoder(fields=fields), None
+                headers = {**headers, 'Content-Type': data.content_type}
+
             resp = self.session.request(method, self.api_url, params=params,
                                         data=data, files=files,
                                         timeout=self.timeout,
-                                        headers=self.headers,
+                                        headers=headers,
                                         verify=True,
                                         stream=True,
                                         auth=auth)
-        except requests.exceptions.Timeout as e:
-            raise TimeoutError(str(e)) from e
-        except requests.exceptions.ConnectionError as e:
-            raise ConnectionError(str(e)) from e
-        except requests.exceptions.HTTPError as e:
-            raise HTTPError(str(e)) from e
-        except requests.exceptions.TooManyRedirects as e:
-            raise TooManyRedirectsError(str(e)) from e
-        except requests.exceptions.RequestException as e:
-            raise RequestError(str(e)) from e
+            try:
+                body = _read_body(resp)
+            finally:
+                # Hand the connection back to the pool right away
+                resp.close()
         except Exception as e:
-            raise RequestError(str(e)) from e
-
+            raise _error_type(e)(str(e)) from e
+
+        return resp, body
+
+    def _streams_uploads(self, auth):
+        # A MultipartEncoder can't be rewound, so it's only used when nothing
+        # will try to send the body again: auth (e.g. Digest) that replays a
+        # request after a 401, a response cache that reads the body to build
+        # its key, or an adapter that retries POSTs.
+        if MultipartEncoder is None or auth is not None or \
+           _is_cached(self.session):
+            return False
+        retry = getattr(self.session.get_adapter(self.api_url),
+                        'max_retries', None)
+        if retry is None or retry.total == 0:
+            return True
+        methods = getattr(retry, 'allowed_methods', None)
+        return methods is not None and 'POST' not in methods
+
+    def _read_doc(self, body, params):
         try:
-            doc = resp.json()
+            doc = _loads(body)
         except ValueError:
-            if resp is None:
-                prefix = "No response data"
-            else:
-                prefix = resp.text[:350]
             raise ValueError("Could not decode as JSON:\n{0}"
-                             .format(prefix))
+                             .format(body[:350].decode('utf-8', 'replace')))
 
         if 'error' in doc:
             raise APIError.from_doc(doc['error'])
 
-        if 'warnings' in doc:
-            logger.warning("The following query raised warnings: {0}"
-                           .format(params or data))
+        if 'warnings' in doc and logger.isEnabledFor(logging.WARNING):
+            logger.warning("The following query raised warnings: %s",
+                           params)
             for module, warning in doc['warnings'].items():
-                logger.warning("\t- {0} -- {1}"
-                               .format(module, warning))
+                logger.warning("\t- %s -- %s", module, warning)
         return doc
 
     def request(self, method, params=None, query_continue=None,
@@ -168,8 +284,47 @@ class Session:
             return self._continuation(method, params=normal_params, auth=auth,
                                       files=files)
         else:
-            return self._request(method, params=normal_params, auth=auth,
-                                 files=files)
+            try:
+                return self._request(method, params=normal_params, auth=auth,
+                                     files=files)
+            except APIError as e:
+                if e.code != 'badtoken':
+                    raise
+                # A cached token went stale.  Swap in a fresh one and retry.
+                stale_types = {token: type
+                               for type, token in self._token_cache.items()}
+                self._token_cache.clear()
+                fresh_tokens = {key: self.get_token(stale_types[value])
+                                for key, value in normal_params.items()
+                                if value in stale_types}
+                if len(fresh_tokens) == 0:
+                    raise
+                normal_params.update(fresh_tokens)
+                return self._request(method, params=normal_params, auth=auth,
+                                     files=files)
+
+    def get_token(self, type='csrf'):
+        """
+        Gets a token for actions that require one (e.g. 'csrf' for edits).
+        Tokens are cached on the session.  When the API rejects a cached
+        token with `badtoken`, :func:`~mwapi.Session.request` fetches a fresh
+        one and retries the request once.
+
+        :Parameters:
+            type : `str`
+                The type of token to get (e.g. "csrf", "watch", "rollback")
+
+        :Returns:
+            The token `str`
+
+        :Raises:
+            :class:`mwapi.errors.APIError` : if the API responds with an error
+        """
+        if type not in self._token_cache:
+            # POSTed so that a stale token is never served from a cache
+            doc = self.post(action='query', meta='tokens', type=type)
+            self._token_cache[type] = doc['query']['tokens'][type + 'token']
+        return self._token_cache[type]
 
     def continuation(self, method, params=None, query_continue=None,
                      auth=None, files=None):
@@ -199,16 +354,17 @@ class Session:
         """
 
     def _continuation(self, method, params=None, files=None, auth=None):
-        if 'continue' not in params:
-            params['continue'] = ''
+        params = dict(params)
+        params.setdefault('continue', '')
 
         while True:
-            doc = self._request(method, params=params, files=files, auth=None)
+            doc = self._request(method, params=params, files=files, auth=auth)
             yield doc
-            if 'continue' not in doc:
+            query_continue = doc.get('continue')
+            if query_continue is None:
                 break
             # re-send all continue values in the next call
-            params.update(doc['continue'])
+            params.update(query_continue)
             files = None  # Don't send files again
 
     def login(self, username, password, login_token=None):
@@ -220,6 +376,9 @@ class Session:
         Note that passwords are sent as plaintext. This is a limitation of the
         Mediawiki API.  Use a https host if you want your password to be secure
 
+        If the session was constructed with a `cookie_path` and the cookies
+        loaded from it still belong to `username`, no login request is sent.
+
         :Parameters:
             username : str
                 The username of the user to be authenticated
@@ -231,6 +390,12 @@ class Session:
             :class:`mwapi.errors.ClientInteractionRequest` : if authentication requires a continue_login() call
             :class:`mwapi.errors.APIError` : if the API responds with an error
         """
+        if self.cookie_path is not None and len(self.session.cookies) > 0:
+            userinfo = self.get(action='query', meta='userinfo')
+            userinfo = userinfo['query']['userinfo']
+            if 'anon' not in userinfo and userinfo.get('name') == username:
+                return {'status': "PASS", 'username': userinfo['name']}
+
         if login_token is None:
             token_doc = self.post(action='query', meta='tokens', type='login')
             login_token = token_doc['query']['tokens']['logintoken']
@@ -244,6 +409,9 @@ class Session:
                 login_token, login_doc['clientlogin'])
         elif login_doc['clientlogin']['status'] != 'PASS':
             raise LoginError.from_doc(login_doc['clientlogin'])
+        self._token_cache.clear()  # Tokens are tied to the logged-in user
+        if self.cookie_path is not None:
+            _save_cookies(self.session.cookies, self.cookie_path)
         return login_doc['clientlogin']
 
     def continue_login(self, login_token, **params):
@@ -271,6 +439,9 @@ class Session:
         login_doc = self.post(**login_params)
         if login_doc['clientlogin']['status'] != 'PASS':
             raise LoginError.from_doc(login_doc['clientlogin'])
+        self._token_cache.clear()  # Tokens are tied to the logged-in user
+        if self.cookie_path is not None:
+            _save_cookies(self.session.cookies, self.cookie_path)
         return login_doc['clientlogin']
 
     def logout(self):
@@ -280,7 +451,10 @@ class Session:
         :Raises:
             :class:`mwapi.errors.APIError` : if the API responds with an error
         """
-        self.post(action='logout')
+        self.post(action='logout', token=self.get_token('csrf'))
+        self._token_cache.clear()
+        if self.cookie_path is not None and os.path.exists(self.cookie_path):
+            os.remove(self.cookie_path)
 
     def get(self, query_continue=None, auth=None, continuation=False,
             **params):
@@ -304,7 +478,6 @@ class Session:
         :Raises:
             :class:`mwapi.errors.APIError` : if the API responds with an error
         """
-
         return self.request('GET', params=params, auth=auth,
                             query_continue=query_continue,
                             continuation=continuation)
@@ -341,3 +514,267 @@ class Session:
         return self.request('POST', params=params, auth=auth,
                             query_continue=query_continue, files=files,
                             continuation=continuation)
+
+    def iter_pages(self, method="GET", query_continue=None, auth=None,
+                   **params):
+        """Makes an API query and yields the documents in the response's
+        `query.pages` one at a time.  If :mod:`ijson` is installed, the pages
+        are parsed as they are read off the connection rather than after the
+        whole response has been decoded, so memory use is bounded by the
+        size of a page rather than the size of the response::
+
+            >>> pages = session.iter_pages(action='query', prop='revisions',
+            ...                            rvprop='content', titles=titles)
+            >>> for page in pages:
+            ...     print(page['title'])
+
+        Note that API warnings are not logged for streamed responses.
+
+        :Parameters:
+            method : `str`
+                Which HTTP method to use for the request?
+                (Usually "POST" or "GET")
+            query_continue : `dict`
+                Optionally, the value of a query continuation 'continue' field.
+            auth : mixed
+                Auth tuple or callable to enable Basic/Digest/Custom HTTP Auth.
+            params :
+                Keyword parameters to be sent with the request.
+
+        :Returns:
+            A generator of page documents
+
+        :Raises:
+            :class:`mwapi.errors.APIError` : if the API responds with an error
+        """
+        params, data = _split_params(
+            method, {**_normalize_params(params, query_continue),
+                     **self._base_params})
+
+        try:
+            resp = self.session.request(method, self.api_url, params=params,
+                                        data=data, timeout=self.timeout,
+                                        headers=self.headers, verify=True,
+                                        stream=True, auth=auth)
+        except Exception as e:
+            raise _error_type(e)(str(e)) from e
+
+        try:
+            # MediaWiki flags error responses with a header, so the error
+            # envelope can be detected without parsing the body first.
+            # Responses replayed from a cache are already in memory.
+            if ijson is None or 'MediaWiki-API-Error' in resp.headers or \
+               getattr(resp, 'from_cache', False):
+                try:
+                    body = _read_body(resp)
+                except Exception as e:
+                    raise _error_type(e)(str(e)) from e
+                doc = self._read_doc(body, params or data)
+                pages = doc.get('query', {}).get('pages', [])
+                if isinstance(pages, dict):  # formatversion=1
+                    pages = pages.values()
+                yield from pages
+            else:
+                resp.raw.decode_content = True
+                formatversion = (params or data).get('formatversion')
+                if str(formatversion) == "2":
+                    pages = ijson.items(resp.raw, 'query.pages.item',
+                                        use_float=True)
+                else:
+                    pages = (page for _, page in ijson.kvitems(
+                        resp.raw, 'query.pages', use_float=True))
+                yield from _translate_errors(pages)
+        finally:
+            resp.close()
+
+    def get_many(self, param_name, values, chunk=50, concurrency=8,
+                 auth=None, **params):
+        """Makes API requests with the GET method for a long list of values
+        of a multi-value parameter (e.g. `titles` or `revids`).  The values
+        are split into chunks of `chunk` values, one request is made per
+        chunk and up to `concurrency` requests are in flight at once::
+
+            >>> docs = session.get_many('titles', titles, action='query',
+            ...                         prop='info')
+            >>> for doc in docs:
+            ...     print(doc['query']['pages'])
+
+        MediaWiki accepts up to 50 values per parameter (500 for clients
+        with the `apihighlimits` right).  If the API reports `toomanyvalues`
+        for a chunk, the chunk is retried in pieces 20% smaller.
+
+        :Parameters:
+            param_name : `str`
+                The name of the multi-value parameter
+            values : `iterable`
+                The values to send for `param_name`
+            chunk : `int`
+                The maximum number of values to send per request
+            concurrency : `int`
+                The maximum number of requests to have in flight at once
+            auth : mixed
+                Auth tuple or callable to enable Basic/Digest/Custom HTTP Auth.
+            params :
+                Keyword parameters to be sent in the query string of every
+                request.
+
+        :Returns:
+            A generator of response JSON documents (in the order of `values`)
+
+        :Raises:
+            :class:`mwapi.errors.APIError` : if the API responds with an error
+        """
+        values = list(values)
+        chunks = [values[i:i + chunk] for i in range(0, len(values), chunk)]
+
+        def _get_chunk(chunk_values):
+            try:
+                return [self.get(auth=auth,
+                                 **{**params, param_name: chunk_values})]
+            except APIError as e:
+                if e.code != 'toomanyvalues' or len(chunk_values) <= 1:
+                    raise
+            smaller = max(1, int(len(chunk_values) * 0.8))
+            return [doc for i in range(0, len(chunk_values), smaller)
+                    for doc in _get_chunk(chunk_values[i:i + smaller])]
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for docs in executor.map(_get_chunk, chunks):
+                yield from docs
+
+
+# Which mwapi error to raise for an exception raised while making a request,
+# in order of precedence.  Anything else becomes a RequestError.
+_ERROR_TRANSLATIONS = (
+    (requests.exceptions.Timeout, TimeoutError),
+    (requests.exceptions.ConnectionError, ConnectionError),
+    (requests.exceptions.HTTPError, HTTPError),
+    (requests.exceptions.TooManyRedirects, TooManyRedirectsError),
+    (urllib3.exceptions.NewConnectionError, ConnectionError),
+    (urllib3.exceptions.TimeoutError, TimeoutError),
+    (urllib3.exceptions.ProtocolError, ConnectionError),
+    (urllib3.exceptions.SSLError, ConnectionError)
+)
+_error_types = {}
+
+
+def _error_type(e):
+    exception_type = type(e)
+    if exception_type not in _error_types:
+        for base, error_type in _ERROR_TRANSLATIONS:
+            if issubclass(exception_type, base):
+                break
+        else:
+            error_type = RequestError
+        _error_types[exception_type] = error_type
+    return _error_types[exception_type]
+
+
+def _translate_errors(iterator):
+    # Errors raised while reading and parsing a response streamed through
+    # ijson surface from the iterator, long after the request was sent.
+    while True:
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        except ijson.JSONError as e:
+            raise ValueError("Could not decode as JSON:\n{0}".format(e)) \
+                from e
+        except Exception as e:
+            raise _error_type(e)(str(e)) from e
+        yield item
+
+
+def _can_resend(files):
+    # File objects have already been read by the time a response arrives
+    return files is None or all(
+        isinstance(content[1] if isinstance(content, tuple) else content,
+                   (str, bytes))
+        for content in files.values())
+
+
+def _is_cached(session):
+    # requests_cache is only imported once a cached session is needed
+    requests_cache = sys.modules.get('requests_cache')
+    return requests_cache is not None and \
+        isinstance(session, requests_cache.CacheMixin)
+
+
+def _read_body(resp):
+    if getattr(resp, 'from_cache', False):
+        # requests_cache replays the stored body through resp.content.  Its
+        # raw response holds the body as it came off the wire (e.g. still
+        # gzipped).
+        return resp.content
+    # Read the body straight off the socket in one go rather than joining it
+    # from chunks via resp.content.
+    return resp.raw.read(decode_content=True)
+
+
+def _load_cookies(cookie_jar, path):
+    with open(path) as f:
+        for cookie_doc in json.load(f):
+            cookie_jar.set_cookie(requests.cookies.create_cookie(**cookie_doc))
+
+
+def _save_cookies(cookie_jar, path):
+    cookie_docs = [{'name': cookie.name, 'value': cookie.value,
+                    'domain': cookie.domain, 'path': cookie.path,
+                    'secure': cookie.secure, 'expires': cookie.expires}
+                   for cookie in cookie_jar]
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(cookie_docs, f)
+    os.chmod(path, 0o600)
+
+
+def _pooled_session(cache_backend=None):
+    if cache_backend is not None:
+        import requests_cache
+        session = requests_cache.CachedSession(
+            cache_name=CACHE_NAME, backend=cache_backend,
+            expire_after=CACHE_EXPIRE_AFTER, match_headers=['Cookie'],
+            filter_fn=_is_cacheable)
+    else:
+        session = requests.Session()
+    # read=False lets read timeouts through as requests.ReadTimeout rather
+    # than retrying them into a ConnectionError.
+    retry_params = dict(total=MAX_RETRIES, read=False,
+                        backoff_factor=BACKOFF_FACTOR,
+                        allowed_methods=frozenset(['GET']),
+                        respect_retry_after_header=True,
+                        raise_on_status=False)
+    # Older versions of urllib3 don't support jitter or capping backoff and
+    # Retry-After.
+    supported_params = inspect.signature(Retry).parameters
+    retry_params.update(
+        (name, value) for name, value in (('backoff_jitter', BACKOFF_JITTER),
+                                          ('backoff_max', BACKOFF_MAX),
+                                          ('retry_after_max', BACKOFF_MAX))
+        if name in supported_params)
+    retry = _Retry(**retry_params)
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+        max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class _Retry(Retry):
+    # Responses to allowed_methods are retried on the statuses chosen for
+    # their method.  POSTs are retried by Session._request instead.
+    def is_retry(self, method, status_code, has_retry_after=False):
+        return self._is_method_retryable(method) and \
+            status_code in _retry_statuses(method)
+
+
+def _is_cacheable(resp):
+    # MediaWiki flags error responses with a header, so they can be excluded
+    # without decoding the body.
+    if 'MediaWiki-API-Error' in resp.headers:
+        return False
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(resp.url).query)
+    return not any(PRIVATE_META.intersection(meta.split("|"))
+                   for meta in query.get('meta', []))
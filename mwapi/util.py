@@ -1,19 +1,103 @@
+import random
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    import json
+    _loads = json.loads
+
+
+# Types whose values are sent as-is
+_PLAIN_TYPES = frozenset([str, int, float])
+
+# Types whose values are joined with "|"
+_JOINED_TYPES = frozenset([list, tuple, set, frozenset])
+
+
 def _normalize_value(value):
-    if isinstance(value, str):
+    value_type = type(value)
+    if value_type is str:
         return value
-    elif isinstance(value, bool):
+    elif value_type is bool:
         return "" if value else None
+    elif value_type in _JOINED_TYPES:
+        try:
+            # Usually a list of titles, which needs no str() calls
+            return "|".join(value)
+        except TypeError:
+            return "|".join(map(str, value))
+    elif value_type in _PLAIN_TYPES or \
+            isinstance(value, (str, bytes, bytearray, dict)):
+        return value
     elif hasattr(value, "__iter__"):
-        return "|".join(str(v) for v in value)
+        # Other iterables, like generators and ranges
+        return "|".join(map(str, value))
     else:
         return value
 
 
 def _normalize_params(params, query_continue=None):
-    normal_params = {k: _normalize_value(v) for k, v in params.items()}
-    normal_params = {k: v for k, v in normal_params.items() if v is not None}
+    if _PLAIN_TYPES.issuperset(map(type, params.values())):
+        # Nothing to join or drop
+        normal_params = dict(params)
+    else:
+        normal_params = {}
+        for key, value in params.items():
+            value = _normalize_value(value)
+            if value is not None:
+                normal_params[key] = value
 
     if query_continue is not None:
         normal_params.update(query_continue)
 
     return normal_params
+
+
+def _as_query(params):
+    return params, None
+
+
+def _as_body(params):
+    return None, params
+
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# POSTs (edits, uploads, logins) may already have been acted on when a 500,
+# 502 or 504 comes back, so they're only retried when the server turned them
+# away.
+POST_RETRY_STATUSES = (429, 503)
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.5
+BACKOFF_JITTER = 0.1
+BACKOFF_MAX = 30  # Also caps how long a Retry-After is honored for
+
+# Whether to send params in the query string or the body, and which response
+# statuses to retry, by HTTP method
+_METHODS = {'GET': (_as_query, RETRY_STATUSES),
+            'POST': (_as_body, POST_RETRY_STATUSES)}
+
+
+def _method_handling(method):
+    return _METHODS.get(method) or \
+        _METHODS.get(method.upper(), _METHODS['GET'])
+
+
+def _split_params(method, params):
+    split, _ = _method_handling(method)
+    return split(params)
+
+
+def _retry_statuses(method):
+    _, retry_statuses = _method_handling(method)
+    return retry_statuses
+
+
+def _retry_delay(attempt, retry_after=None):
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass  # An HTTP-date.  Fall back on exponential backoff.
+    return min(BACKOFF_FACTOR * 2 ** attempt +
+               random.random() * BACKOFF_JITTER, BACKOFF_MAX)
@@ -3,7 +3,11 @@ import os.path
 from setuptools import setup
 
 about_path = os.path.join(os.path.dirname(__file__), "mwapi/about.py")
-exec(compile(open(about_path).read(), about_path, "exec"))
+with open(about_path) as f:
+    exec(compile(f.read(), about_path, "exec"))
+
+with open("README.md", encoding="utf-8") as f:
+    LONG_DESC = f.read()
 
 setup(
     name=__name__,  # noqa
@@ -14,7 +18,13 @@ setup(
     url=__url__,  # noqa
     license=__license__,  # noqa
     packages=["mwapi"],
-    long_description=open("README.md").read(),
+    long_description=LONG_DESC,
     long_description_content_type="text/markdown",
-    install_requires=["requests", "aiohttp"]
+    install_requires=["requests", "aiohttp"],
+    extras_require={
+        "cache": ["requests-cache"],
+        "orjson": ["orjson"],
+        "streaming": ["ijson"],
+        "upload": ["requests-toolbelt"]
+    }
 )